@@ -3,12 +3,12 @@ import os
 import queue
 import socket
 import threading
-import time
 from concurrent.futures import Future
 from dataclasses import dataclass
 
 import amqp
 import kombu
+import kombu.pools
 
 from agency.logger import log
 from agency.queue import Queue
@@ -18,6 +18,22 @@ from agency.space import Space
 
 _BROADCAST_KEY = "__broadcast__"
 
+# Publishing gives up after these retries rather than blocking forever while
+# the broker is unreachable
+_PUBLISH_RETRY_POLICY = {
+    'max_retries': 3,
+    'interval_start': 0,
+    'interval_step': 1,
+    'interval_max': 2,
+}
+
+# Producer pools shared by the outbound queues of a process that use the same
+# connection options, along with the number of connected queues using each.
+# A pool is closed once the last queue using it disconnects.
+_producer_pools = {}
+_producer_pools_lock = threading.Lock()
+
+
 @dataclass
 class AMQPOptions:
     """A class that defines AMQP connection options"""
@@ -66,7 +82,11 @@ class _AMQPInboundQueue(_AMQPQueue):
 
         def _callback(body, amqp_message):
             amqp_message.ack()
-            self._received_queue.put(json.loads(body))
+            # messages published by AMQPSpace are decoded by kombu, while those
+            # from other clients (e.g. over MQTT) arrive as raw JSON
+            if not isinstance(body, dict):
+                body = json.loads(body)
+            self._received_queue.put(body)
 
         try:
             self._connection = kombu.Connection(
@@ -98,9 +118,10 @@ class _AMQPInboundQueue(_AMQPQueue):
             try:
                 while not disconnecting.is_set():
                     try:
+                        # drain_events blocks until a message arrives or the
+                        # timeout elapses, so no additional sleep is needed
                         self._connection.heartbeat_check()
                         self._connection.drain_events(timeout=0.2)
-                        time.sleep(0.1)
                     except socket.timeout:
                         pass
             except amqp.exceptions.ConnectionForced:
@@ -139,26 +160,67 @@ class _AMQPOutboundQueue(_AMQPQueue):
     def __init__(self, amqp_options: AMQPOptions, exchange_name: str, routing_key: str):
         super().__init__(amqp_options, exchange_name, routing_key)
         self._exchange: kombu.Exchange = None
+        self._producer_pool_key: tuple = None
 
     def connect(self):
         self._exchange = kombu.Exchange(
             self.exchange_name, 'topic', durable=True)
-        
+        # Queues with the same options share a pool of open connections
+        # instead of connecting per message. The pid is part of the key so that
+        # a forked process never uses its parent's connections.
+        key = (os.getpid(), tuple(sorted(self.kombu_connection_options.items())))
+        with _producer_pools_lock:
+            if key not in _producer_pools:
+                connection = kombu.Connection(**{
+                    **self.kombu_connection_options,
+                    # Pooled connections may sit idle for longer than the
+                    # heartbeat interval and nothing runs heartbeat checks on
+                    # them, so heartbeats are disabled rather than letting the
+                    # broker close them.
+                    'heartbeat': 0,
+                    # bounds the connection attempts when a producer is acquired
+                    'transport_options': dict(_PUBLISH_RETRY_POLICY),
+                })
+                limit = kombu.pools.get_limit()
+                _producer_pools[key] = [
+                    kombu.pools.ProducerPool(connection.Pool(limit), limit=limit),
+                    0,
+                ]
+            _producer_pools[key][1] += 1
+        self._producer_pool_key = key
+
+    def disconnect(self):
+        if self._producer_pool_key is None:
+            return
+        with _producer_pools_lock:
+            entry = _producer_pools[self._producer_pool_key]
+            entry[1] -= 1
+            if entry[1] == 0:
+                del _producer_pools[self._producer_pool_key]
+                producer_pool = entry[0]
+                producer_pool.force_close_all()
+                producer_pool.connections.force_close_all()
+        self._producer_pool_key = None
+
     def put(self, message: Message):
-        with kombu.Connection(**self.kombu_connection_options) as connection:
-            with connection.Producer() as producer:
-                if message['to'] == '*':
-                    producer.publish(
-                        json.dumps(message),
-                        exchange=self._exchange,
-                        routing_key=_BROADCAST_KEY,
-                    )
-                else:
-                    producer.publish(
-                        json.dumps(message),
-                        exchange=self._exchange,
-                        routing_key=message['to'],
-                    )
+        if message['to'] == '*':
+            routing_key = _BROADCAST_KEY
+        else:
+            routing_key = message['to']
+        producer_pool = _producer_pools[self._producer_pool_key][0]
+        with producer_pool.acquire(block=True) as producer:
+            producer.publish(
+                # encoded once here and marked as JSON, so that kombu sends it
+                # as is rather than encoding the string a second time
+                json.dumps(message),
+                content_type='application/json',
+                content_encoding='utf-8',
+                exchange=self._exchange,
+                routing_key=routing_key,
+                # pooled connections may have been closed by the broker
+                retry=True,
+                retry_policy=_PUBLISH_RETRY_POLICY,
+            )
 
     def get(self, block: bool = True, timeout: float = None) -> Message:
         raise NotImplementedError("AMQPOutboundQueue does not support get")
@@ -191,7 +253,7 @@ class AMQPSpace(Space):
             password=os.environ.get('AMQP_PASSWORD', 'guest'),
             virtual_host=os.environ.get('AMQP_VHOST', '/'),
             use_ssl=False,
-            heartbeat=60,
+            heartbeat=float(os.environ.get('AMQP_HEARTBEAT', 60)),
         )
 
     def _create_inbound_queue(self, agent_id) -> Queue:
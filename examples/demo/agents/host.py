@@ -1,31 +1,131 @@
 import os
+import select
+import signal
 import subprocess
+import threading
+import time
+import uuid
+
+import orjson
 
 from agents.mixins.help_methods import HelpMethods
 
 from agency.agent import ACCESS_REQUESTED, Agent, action
 
+# characters that must be escaped inside a bash $'...' string
+_ANSI_C_ESCAPES = {"\\": "\\\\", "'": "\\'", "\n": "\\n", "\r": "\\r"}
+
 
 class Host(HelpMethods, Agent):
     """
     Represents the host system of the running application
+
+    Shell commands are run in a single long running bash login shell, so the
+    login profile is only loaded once and shell state persists between commands.
     """
 
+    def __init__(self, id: str, command_timeout: float = 300, **kwargs):
+        """
+        Args:
+            id: The id of the agent
+            command_timeout:
+                Seconds to wait for a shell command to finish before the shell
+                and the processes it started are killed. Defaults to 300.
+            **kwargs: Passed to Agent
+        """
+        super().__init__(id, **kwargs)
+        self.__command_timeout = command_timeout
+        self.__bash: subprocess.Popen = None
+        self.__bash_lock: threading.Lock = threading.Lock()
+
+    def before_remove(self):
+        super().before_remove()
+        with self.__bash_lock:
+            self.__kill_bash()
+
     @action(access_policy=ACCESS_REQUESTED)
     def shell_command(self, command: str) -> str:
         """Execute a shell command"""
-        command = ["bash", "-l", "-c", command]
-        result = subprocess.run(
-          command,
-          stdout=subprocess.PIPE,
-          stderr=subprocess.PIPE,
-          text=True,
-        )
-        output = result.stdout + result.stderr
-        if result.returncode != 0:
+        with self.__bash_lock:
+            output, returncode = self.__run_in_bash(command)
+        if returncode != 0:
             raise Exception(output)
         self.respond_with(output)
 
+    def __kill_bash(self):
+        if self.__bash is not None:
+            # bash leads its own process group, so this also kills any
+            # processes started by the command
+            try:
+                os.killpg(self.__bash.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+            self.__close_bash()
+
+    def __close_bash(self) -> int:
+        """Waits for the bash process and closes its pipes"""
+        returncode = self.__bash.wait()
+        self.__bash.stdin.close()
+        self.__bash.stdout.close()
+        self.__bash = None
+        return returncode
+
+    def __run_in_bash(self, command: str):
+        """
+        Runs a command in the bash process, starting it if necessary, and
+        returns its combined output and exit code
+        """
+        if self.__bash is not None and self.__bash.poll() is not None:
+            self.__close_bash()
+        if self.__bash is None:
+            self.__bash = subprocess.Popen(
+                ["bash", "-l"],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                bufsize=0,
+                start_new_session=True,
+            )
+
+        # The command is passed to eval on a single line as an ANSI-C quoted
+        # string, so that a syntax error (e.g. an unbalanced quote) fails the
+        # command instead of consuming the lines that follow it. Its stdin is
+        # redirected so that it can't consume the input meant for the shell. A
+        # sentinel line carrying the exit code marks the end of its output.
+        quoted = "".join(_ANSI_C_ESCAPES.get(char, char) for char in command)
+        sentinel = f"__END_{uuid.uuid4().hex}__:"
+        self.__bash.stdin.write(
+            f"eval $'{quoted}' < /dev/null\n"
+            f"printf '\\n{sentinel}%d\\n' $?\n".encode())
+
+        # Output is read straight from the pipe so that the wait can time out
+        marker = f"\n{sentinel}".encode()
+        fd = self.__bash.stdout.fileno()
+        deadline = time.monotonic() + self.__command_timeout
+        output = b""
+        position = -1
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not select.select([fd], [], [], remaining)[0]:
+                self.__kill_bash()
+                raise TimeoutError(
+                    f"Command timed out after {self.__command_timeout} seconds")
+            chunk = os.read(fd, 65536)
+            if not chunk:
+                # the command exited the shell
+                returncode = self.__close_bash()
+                return output.decode(errors="replace"), returncode
+            output += chunk
+            if position == -1:
+                # the marker may straddle the previous chunk
+                position = output.find(
+                    marker, max(0, len(output) - len(chunk) - len(marker)))
+            if position != -1:
+                end = output.find(b"\n", position + len(marker))
+                if end != -1:
+                    returncode = int(output[position + len(marker):end])
+                    return output[:position].decode(errors="replace"), returncode
+
     @action(access_policy=ACCESS_REQUESTED)
     def write_to_file(self, filepath: str, text: str, mode: str = "w") -> str:
         """Write to a file"""
@@ -40,6 +140,20 @@ class Host(HelpMethods, Agent):
             text = f.read()
         self.respond_with(text)
 
+    @action(access_policy=ACCESS_REQUESTED)
+    def read_files(self, filepaths: list) -> dict:
+        """
+        Read multiple files
+
+        Args:
+            filepaths: The paths of the files to read
+        """
+        files = {}
+        for filepath in filepaths:
+            with open(filepath, "r") as f:
+                files[filepath] = f.read()
+        self.respond_with(files)
+
     @action(access_policy=ACCESS_REQUESTED)
     def delete_file(self, filepath: str) -> str:
         """Delete a file"""
@@ -49,8 +163,16 @@ class Host(HelpMethods, Agent):
     @action(access_policy=ACCESS_REQUESTED)
     def list_files(self, directory_path: str) -> str:
         """List files in a directory"""
-        files = os.listdir(directory_path)
-        self.respond_with(f"{files}")
+        with os.scandir(directory_path) as entries:
+            files = [
+                {
+                    "name": entry.name,
+                    "dir": entry.is_dir(),
+                    "size": entry.stat(follow_symlinks=False).st_size,
+                }
+                for entry in entries
+            ]
+        self.respond_with(orjson.dumps(files).decode())
 
     def request_permission(self, proposed_message: dict) -> bool:
         """Asks for permission on the command line"""
@@ -16,6 +16,9 @@ class HelpMethods():
     Where the help object above is whatever is returned by the `help` method for
     each action.
 
+    `_available_actions_version` is incremented whenever `_available_actions`
+    changes, allowing subclasses to cache values derived from it.
+
     NOTE This does not handle agent removal
     """
 
@@ -26,6 +29,7 @@ class HelpMethods():
         2. a message to announce its actions to other agents
         """
         self._available_actions: Dict[str, Dict[str, dict]] = {}
+        self._available_actions_version: int = 0
         self.send({
             "meta": {
                 "id": "help_request",
@@ -52,6 +56,7 @@ class HelpMethods():
         current_message = self.current_message()
         if current_message["meta"].get("parent_id", None) == "help_request":
             self._available_actions[current_message["from"]] = value
+            self._available_actions_version += 1
         else:
             # this was in response to something else, call the original
             super().handle_action_value(value)
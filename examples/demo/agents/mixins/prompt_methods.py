@@ -1,11 +1,40 @@
-import json
 from abc import ABC, ABCMeta, abstractmethod
 from datetime import datetime
-from typing import List
+from typing import Iterable
+
+import orjson
 
-from agency import util
 from agency.schema import Message
 
+DEFAULT_TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def to_timestamp(dt: datetime = None, date_format=DEFAULT_TIMESTAMP_FORMAT):
+    """Convert a datetime to a timestamp, defaulting to the current time"""
+    if dt is None:
+        dt = datetime.now()
+    return dt.strftime(date_format)
+
+
+def extract_json(input: str, stopping_strings: list = []):
+    """Util method to extract JSON from a string"""
+    # only the text before the first stopping string found is considered
+    split_string = input
+    for stopping_string in stopping_strings:
+        if stopping_string in input:
+            split_string = input.partition(stopping_string)[0]
+            break
+    start_position = split_string.find('{')
+    end_position = split_string.rfind('}') + 1
+
+    if start_position == -1 or end_position == 0 or start_position > end_position:
+        raise ValueError(f"Couldn't find valid JSON in \"{input}\"")
+
+    try:
+        return orjson.loads(split_string[start_position:end_position])
+    except orjson.JSONDecodeError:
+        raise ValueError(f"Couldn't parse JSON in \"{input}\"")
+
 
 class PromptMethods(ABC, metaclass=ABCMeta):
     """
@@ -19,12 +48,9 @@ class PromptMethods(ABC, metaclass=ABCMeta):
         """
         return self._prompt_head() + self._pre_prompt(agent_id=self.id())
 
-    def _message_log_to_list(self, message_log: List[Message]) -> str:
+    def _message_log_to_list(self, message_log: Iterable[Message]) -> str:
         """Convert an array of message_log entries to a prompt ready list"""
-        promptable_list = ""
-        for message in message_log:
-            promptable_list += self._message_line(message)
-        return promptable_list
+        return "".join([self._message_line(message) for message in message_log])
 
     @abstractmethod
     def _prompt_head(self):
@@ -33,10 +59,12 @@ class PromptMethods(ABC, metaclass=ABCMeta):
         """
 
     @abstractmethod
-    def _pre_prompt(self, agent_id: str, timestamp=util.to_timestamp(datetime.now())):
+    def _pre_prompt(self, agent_id: str, timestamp: str = None):
         """
         Returns the "pre-prompt", the special string sequence that indicates it is
         ones turn to act: e.g. "### Assistant: "
+
+        If timestamp is not given, implementations should use the current time.
         """
 
     @abstractmethod
@@ -44,25 +72,3 @@ class PromptMethods(ABC, metaclass=ABCMeta):
         """
         Returns a single line for a prompt that represents a previous message
         """
-
-    DEFAULT_TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
-
-    def to_timestamp(dt=datetime.now(), date_format=DEFAULT_TIMESTAMP_FORMAT):
-        """Convert a datetime to a timestamp"""
-        return dt.strftime(date_format)
-
-    def extract_json(input: str, stopping_strings: list = []):
-        """Util method to extract JSON from a string"""
-        stopping_string = next((s for s in stopping_strings if s in input), '')
-        split_string = input.split(stopping_string, 1)[
-            0] if stopping_string else input
-        start_position = split_string.find('{')
-        end_position = split_string.rfind('}') + 1
-
-        if start_position == -1 or end_position == -1 or start_position > end_position:
-            raise ValueError(f"Couldn't find valid JSON in \"{input}\"")
-
-        try:
-            return json.loads(split_string[start_position:end_position])
-        except json.JSONDecodeError:
-            raise ValueError(f"Couldn't parse JSON in \"{input}\"")
@@ -12,27 +12,29 @@ class SayResponseMethods():
     NOTE The _message_log will contain both messages
     """
 
+    __slots__ = ()
+
     def handle_action_value(self, value):
         if self.parent_message()["action"]["name"] != "say":
-            # This was in response to a function call, convert it to a `say`
-            self._receive({
-                **self.current_message(),
-                "action": {
-                    "name": "say",
-                    "args": {
-                        "content": f"{value}",
-                    }
-                },
-            })
-
-    def handle_action_error(self, error: ActionError):
-        # convert errors into a `say` for inspection
-        self._receive({
-            **self.current_message(),
-            "action": {
+            # This was in response to a function call, convert it to a `say`.
+            # The current message is also in the message log so we modify a
+            # copy of it.
+            message = self.current_message().copy()
+            message["action"] = {
                 "name": "say",
                 "args": {
-                    "content": f"ERROR: {error}",
+                    "content": f"{value}",
                 }
-            },
-        })
+            }
+            self._receive(message)
+
+    def handle_action_error(self, error: ActionError):
+        # convert errors into a `say` for inspection
+        message = self.current_message().copy()
+        message["action"] = {
+            "name": "say",
+            "args": {
+                "content": f"ERROR: {error}",
+            }
+        }
+        self._receive(message)
@@ -1,13 +1,14 @@
-import json
 import textwrap
-from datetime import datetime
+from itertools import islice
+from typing import Dict, Iterator, List, Tuple
 
 import openai
+import orjson
 from agents.mixins.help_methods import HelpMethods
-from agents.mixins.prompt_methods import PromptMethods
+from agents.mixins.prompt_methods import (PromptMethods, extract_json,
+                                          to_timestamp)
 from agents.mixins.say_response_methods import SayResponseMethods
 
-from agency import util
 from agency.agent import Agent, action
 from agency.schema import Message
 
@@ -17,13 +18,27 @@ class OpenAICompletionAgent(HelpMethods, SayResponseMethods, PromptMethods, Agen
     An agent which uses OpenAI's completion API for inference
     """
 
+    __slots__ = (
+        "_OpenAICompletionAgent__client",
+        "_OpenAICompletionAgent__model",
+        "_OpenAICompletionAgent__prompt_log",
+        "_OpenAICompletionAgent__prompt_log_len",
+        "_OpenAICompletionAgent__prompt_log_entries",
+        "_OpenAICompletionAgent__prompt_preface",
+    )
+
     def __init__(self, id, model, openai_api_key, **args):
         super().__init__(id, **args)
+        self.__client = openai.OpenAI(api_key=openai_api_key)
         self.__model = model
-        openai.api_key = openai_api_key
-
-    def _prompt_head(self):
-        return textwrap.dedent(f"""
+        self.__prompt_log: List[Message] = []
+        self.__prompt_log_len: int = 0
+        # (timestamp, serialized message) tuples keyed by id(). Messages are
+        # kept alive by __prompt_log so their ids remain unique.
+        self.__prompt_log_entries: Dict[int, Tuple[str, str]] = {}
+        # The preface does not change, so it is built once. Keeping it as an
+        # identical prefix of every prompt also lets OpenAI cache it.
+        self.__prompt_preface: str = textwrap.dedent(f"""
         I am "{self.id()}". I am an early prototype of an "agent" system which
         can freely interact with its environment.
 
@@ -42,36 +57,68 @@ class OpenAICompletionAgent(HelpMethods, SayResponseMethods, PromptMethods, Agen
         present. The following JSON schema describes the message format:
 
         ```
-        {json.dumps(Message.schema())}
+        {orjson.dumps(Message.schema()).decode()}
         ```
 
         %%%%% Terminal App 1.0.0 %%%%%
-        """) + \
-            self._message_log_to_list([
-                # Ignore outgoing help_request messages
-                message
-                for message in self._message_log
-                if not (message['from'] == self.id() and message.get('id') == "help_request")
-            ])
-
-    def _pre_prompt(self, agent_id, timestamp=util.to_timestamp(datetime.now())):
+        """)
+
+    def _prompt_head(self):
+        return self.__prompt_preface + \
+            self._message_log_to_list(self.__filtered_message_log())
+
+    def __filtered_message_log(self) -> Iterator[Message]:
+        """
+        Returns an iterator over the message log excluding outgoing help_request
+        messages
+
+        The message log is append-only, so the filtered list is kept and only
+        extended with messages added since the last call. Each message is
+        timestamped and serialized once as it is added.
+        """
+        agent_id = self.id()
+        with self._message_log_lock:
+            timestamp = to_timestamp()
+            for message in self._message_log[self.__prompt_log_len:]:
+                if not (message['from'] == agent_id and message.get('id') == "help_request"):
+                    self.__prompt_log.append(message)
+                    self.__prompt_log_entries[id(message)] = (
+                        timestamp, orjson.dumps(message).decode())
+            self.__prompt_log_len = len(self._message_log)
+            # iterate up to the current length rather than copying the list.
+            # messages appended later by other threads are not included.
+            return islice(self.__prompt_log, len(self.__prompt_log))
+
+    def _pre_prompt(self, agent_id, timestamp=None):
+        if timestamp is None:
+            timestamp = to_timestamp()
         return f"\n[{timestamp}] {agent_id}:"
 
     def _message_line(self, message: dict):
-        pre_prompt = self._pre_prompt(message['from'])
-        return f"{pre_prompt} {json.dumps(message)}/END"
+        timestamp, message_json = self.__prompt_log_entries[id(message)]
+        pre_prompt = self._pre_prompt(message['from'], timestamp)
+        return f"{pre_prompt} {message_json}/END"
 
     @action
     def say(self, content: str) -> bool:
         # NOTE that we don't use the content arg here since we construct the
         # prompt from the message log
         full_prompt = self._full_prompt()
-        completion = openai.Completion.create(
+        completion = self.__client.completions.create(
           model=self.__model,
           prompt=full_prompt,
           temperature=0.1,
           max_tokens=500,
+          stream=True,
         )
+        # read the output until the end of the first action, so that it can be
+        # sent without waiting for the rest of the completion
+        text = ""
+        for chunk in completion:
+            text += chunk.choices[0].text
+            if "/END" in text:
+                break
+        completion.close()
         # parse the output
-        action = util.extract_json(completion.choices[0].text, ["/END"])
+        action = extract_json(text, ["/END"])
         self.send(action)
@@ -1,7 +1,8 @@
-import json
 import textwrap
+from typing import Dict, List, Tuple
 
 import openai
+import orjson
 from agents.mixins.help_methods import HelpMethods
 from agents.mixins.say_response_methods import SayResponseMethods
 
@@ -13,11 +14,34 @@ class OpenAIFunctionAgent(HelpMethods, SayResponseMethods, Agent):
     An agent which uses OpenAI's function calling API
     """
 
+    __slots__ = (
+        "_OpenAIFunctionAgent__client",
+        "_OpenAIFunctionAgent__model",
+        "_OpenAIFunctionAgent__user_id",
+        "_OpenAIFunctionAgent__open_ai_messages_cache",
+        "_OpenAIFunctionAgent__open_ai_messages_len",
+        "_OpenAIFunctionAgent__open_ai_functions_cache",
+        "_OpenAIFunctionAgent__open_ai_functions_version",
+        "_OpenAIFunctionAgent__function_targets",
+        "_OpenAIFunctionAgent__system_message",
+    )
+
     def __init__(self, id, model, openai_api_key, user_id):
         super().__init__(id, receive_own_broadcasts=False)
+        self.__client = openai.OpenAI(api_key=openai_api_key)
         self.__model = model
         self.__user_id = user_id
-        openai.api_key = openai_api_key
+        self.__open_ai_messages_cache: List[dict] = []
+        self.__open_ai_messages_len: int = 0
+        self.__open_ai_functions_cache: List[dict] = None
+        self.__open_ai_functions_version: int = -1
+        self.__function_targets: Dict[str, Tuple[str, str]] = {}
+        # The system prompt does not change, so it is built once. Keeping it as
+        # an identical prefix of every request also lets OpenAI cache it.
+        self.__system_message: dict = {
+            "role": "system",
+            "content": self.__system_prompt(),
+        }
 
     def __system_prompt(self):
         return textwrap.dedent(f"""
@@ -40,84 +64,118 @@ class OpenAIFunctionAgent(HelpMethods, SayResponseMethods, Agent):
         Returns a list of messages converted from the message_log to be sent to
         OpenAI
         """
+        # The message log is append-only, so previously converted messages are
+        # kept and only the messages added since the last call are converted.
+        agent_id = self.id()
+        with self._message_log_lock:
+            for message in self._message_log[self.__open_ai_messages_len:]:
+                open_ai_message = self.__open_ai_message(message, agent_id)
+                if open_ai_message is not None:
+                    self.__open_ai_messages_cache.append(open_ai_message)
+            self.__open_ai_messages_len = len(self._message_log)
+            open_ai_messages = list(self.__open_ai_messages_cache)
+
         # start with the system message
-        open_ai_messages = [
-            {"role": "system", "content": self.__system_prompt()}]
+        return [self.__system_message] + open_ai_messages
+
+    def __open_ai_message(self, message: dict, agent_id: str):
+        """
+        Converts a single message from the message_log to an OpenAI message or
+        returns None if it should not be sent
 
-        # format and add the rest of the messages
+        Args:
+            message: The message to convert
+            agent_id: This agent's id, passed in to avoid repeated lookups
+        """
         # NOTE: the chat api limits to only four predefined roles so we do our
         # best to translate to them here.
-        for message in self._message_log:
-            # ignore response messages
-            if message['action']['name'] != _RESPONSE_ACTION_NAME:
-                # "say" actions are converted to messages using the content arg
-                if message['action']['name'] == "say":
-                    # assistant
-                    if message['from'] == self.id():
-                        open_ai_messages.append({
-                            "role": "assistant",
-                            "content": message["action"]["args"]["content"],
-                        })
-                    # user
-                    elif message['from'] == self.__user_id:
-                        open_ai_messages.append({
-                            "role": "user",
-                            "content": message["action"]["args"]["content"],
-                        })
-
-                    # a "say" from anyone else is considered a function message
-                    else:
-                        open_ai_messages.append({
-                            "role": "function",
-                            "name": f"{'-'.join(message['from'].split('.'))}-{message['action']['name']}",
-                            "content": message["action"]["args"]["content"],
-                        })
-
-                # all other actions are considered a function_call
-                else:
-                    # AFAICT from the documentation I've found, it does not
-                    # appear that openai suggests including function_call
-                    # messages (the responses from openai) in the messages list.
-                    #
-                    # I am going to add them here as a "system" message
-                    # reporting the details of what the function call was. This
-                    # is important information to infer from and it's currently
-                    # not clear whether the language model has access to it
-                    # during inference.
-                    open_ai_messages.append({
-                        "role": "system",
-                        "content": f"""{message['from']} called function "{message['action']['name']}" with args {message['action'].get('args', {})}""",
-                    })
-
-        return open_ai_messages
+
+        # ignore response messages
+        if message['action']['name'] == _RESPONSE_ACTION_NAME:
+            return None
+
+        # "say" actions are converted to messages using the content arg
+        if message['action']['name'] == "say":
+            # assistant
+            if message['from'] == agent_id:
+                return {
+                    "role": "assistant",
+                    "content": message["action"]["args"]["content"],
+                }
+            # user
+            elif message['from'] == self.__user_id:
+                return {
+                    "role": "user",
+                    "content": message["action"]["args"]["content"],
+                }
+            # a "say" from anyone else is considered a function message
+            else:
+                return {
+                    "role": "function",
+                    "name": f"{message['from'].replace('.', '-')}-{message['action']['name']}",
+                    "content": message["action"]["args"]["content"],
+                }
+
+        # all other actions are considered a function_call
+        #
+        # AFAICT from the documentation I've found, it does not appear that
+        # openai suggests including function_call messages (the responses from
+        # openai) in the messages list.
+        #
+        # I am going to add them here as a "system" message reporting the
+        # details of what the function call was. This is important information
+        # to infer from and it's currently not clear whether the language model
+        # has access to it during inference.
+        return {
+            "role": "system",
+            "content": f"""{message['from']} called function "{message['action']['name']}" with args {message['action'].get('args', {})}""",
+        }
 
     def __open_ai_functions(self):
         """
         Returns a list of functions converted from space._get_help__sync() to be
         sent to OpenAI as the functions arg
+
+        The list is rebuilt only when _available_actions has changed, along
+        with a lookup from each function name to its agent id and action name.
         """
-        functions = [
-            {
+        if self.__open_ai_functions_version == self._available_actions_version:
+            return self.__open_ai_functions_cache
+
+        functions = []
+        function_targets = {}
+        for agent_id, actions in self._available_actions.items():
+            for action_name, action_help in actions.items():
+                # the openai chat api handles a chat message differently than a
+                # function, so we don't list the user's "say" action as a
+                # function
+                if agent_id == self.__user_id and action_name == "say":
+                    continue
                 # note that we send a fully qualified name for the action and
                 # convert '.' to '-' since openai doesn't allow '.'
-                "name": f"{agent_id}-{action_name}",
-                "description": action_help.get("description", ""),
-                "parameters": {
-                    "type": "object",
-                    "properties": action_help['args'],
-                    "required": [
-                        # We don't currently support a notion of required args
-                        # so we make everything required
-                        arg_name for arg_name in action_help['args'].keys()
-                    ],
-                }
-            }
-            for agent_id, actions in self._available_actions.items()
-            for action_name, action_help in actions.items()
-            if not (agent_id == self.__user_id and action_name == "say")
-            # the openai chat api handles a chat message differently than a
-            # function, so we don't list the user's "say" action as a function
-        ]
+                function_name = f"{agent_id}-{action_name}"
+                function_targets[function_name] = (agent_id, action_name)
+                functions.append({
+                    "name": function_name,
+                    "description": action_help.get("description", ""),
+                    "parameters": {
+                        "type": "object",
+                        "properties": {
+                            # openai requires an items schema for arrays
+                            arg_name: {"items": {}, **arg_help}
+                            if arg_help.get("type") == "array" else arg_help
+                            for arg_name, arg_help in action_help['args'].items()
+                        },
+                        "required": [
+                            # We don't currently support a notion of required
+                            # args so we make everything required
+                            arg_name for arg_name in action_help['args'].keys()
+                        ],
+                    }
+                })
+        self.__open_ai_functions_cache = functions
+        self.__function_targets = function_targets
+        self.__open_ai_functions_version = self._available_actions_version
         return functions
 
     @action
@@ -125,7 +183,7 @@ class OpenAIFunctionAgent(HelpMethods, SayResponseMethods, Agent):
         """
         Sends a message to this agent
         """
-        completion = openai.ChatCompletion.create(
+        completion = self.__client.chat.completions.create(
           model=self.__model,
           messages=self.__open_ai_messages(),
           functions=self.__open_ai_functions(),
@@ -138,23 +196,25 @@ class OpenAIFunctionAgent(HelpMethods, SayResponseMethods, Agent):
             "to": self.__user_id,
             "action": {}
         }
-        response_message = completion['choices'][0]['message']
-        if 'function_call' in response_message:
+        response_message = completion.choices[0].message
+        if response_message.function_call is not None:
             # extract receiver and action
-            function_parts = response_message['function_call']['name'].split(
-                '-')
-            message['to'] = "-".join(function_parts[:-1])  # all but last
-            message['action']['name'] = function_parts[-1]  # last
-            # arguments comes as a string when it probably should be an object
-            if isinstance(response_message['function_call']['arguments'], str):
-                message['action']['args'] = json.loads(
-                    response_message['function_call']['arguments'])
+            function_name = response_message.function_call.name
+            if function_name in self.__function_targets:
+                message['to'], message['action']['name'] = \
+                    self.__function_targets[function_name]
             else:
-                message['action']['args'] = response_message['function_call']['arguments']
+                # not a function we listed, so parse the name instead
+                function_parts = function_name.split('-')
+                message['to'] = "-".join(function_parts[:-1])  # all but last
+                message['action']['name'] = function_parts[-1]  # last
+            # arguments comes as a JSON encoded string
+            message['action']['args'] = orjson.loads(
+                response_message.function_call.arguments)
         else:
             message['action']['name'] = "say"
             message['action']['args'] = {
-                "content": response_message['content'],
+                "content": response_message.content,
             }
 
         self.send(message)
@@ -1,22 +1,140 @@
-import json
+import asyncio
+import functools
 import re
-import gradio as gr
+import threading
+from typing import AsyncIterator, List, Set, Tuple
+import orjson
 from agency.agent import Agent, action
 from agency.schema import Message
 
+# Custom css to:
+# - Expand text area to fill vertical space
+# - Remove orange border from the chat area that appears while streaming
+_GRADIO_CSS = """
+.gradio-container {
+    height: 100vh !important;
+}
+
+.gradio-container > .main,
+.gradio-container > .main > .wrap,
+.gradio-container > .main > .wrap > .contain,
+.gradio-container > .main > .wrap > .contain > div {
+    height: 100% !important;
+}
+
+#chatbot {
+    height: auto !important;
+    flex-grow: 1 !important;
+}
+
+#chatbot > div.wrap {
+    border: none !important;
+}
+"""
+
+# Matches input of the form: /agent_id.action_name args...
+_INPUT_PATTERN = re.compile(
+    r'^/(?:((?:"[^"]+")|(?:[^.\s]+))\.)?(\w+)\s*(.*)$')
+# Matches each argument of the form: name:"value"
+_ARGS_PATTERN = re.compile(r'(\w+):"([^"]*)"')
+
+
+@functools.lru_cache(maxsize=256)
+def _parse_slash_command(text: str) -> Tuple[str, str, Tuple[Tuple[str, str], ...]]:
+    """
+    Parses a slash command into its agent id, action name and arguments.
+
+    Results are cached since users often repeat the same commands. Arguments
+    are returned as a tuple of pairs so that the cached value is immutable.
+    """
+    match = _INPUT_PATTERN.match(text)
+
+    if not match:
+        raise ValueError("Invalid input format")
+
+    agent_id, action_name, args_str = match.groups()
+
+    if agent_id is None:
+        raise ValueError("Agent ID must be provided. Example: '/MyAgent.say' or '/*.say'")
+
+    return agent_id.strip('"'), action_name, tuple(_ARGS_PATTERN.findall(args_str))
+
 
 class GradioUser(Agent):
     """
     Represents the Gradio user as an Agent and contains methods for integrating
     with the Chatbot component
     """
-    def __init__(self, id: str):
+
+    __slots__ = (
+        "_GradioUser__auto_target",
+        "_GradioUser__max_messages",
+        "_GradioUser__chatbot_messages",
+        "_GradioUser__chatbot_messages_len",
+        "_GradioUser__streams",
+        "_GradioUser__streams_lock",
+        "_GradioUser__sender_ids",
+    )
+
+    def __init__(self,
+                 id: str,
+                 auto_target: bool = False,
+                 max_messages: int = 1000):
+        """
+        Args:
+            id: The id of the agent
+            auto_target:
+                If True, plain text messages are sent directly to the only
+                other agent seen so far instead of being broadcast. Defaults to
+                False
+            max_messages:
+                The number of most recent messages kept in the message log and
+                shown in the chat. Defaults to 1000
+        """
         super().__init__(id, receive_own_broadcasts=False)
+        self.__auto_target: bool = auto_target
+        self.__max_messages: int = max_messages
+        self.__chatbot_messages: List[Tuple[str, str]] = []
+        self.__chatbot_messages_len: int = 0
+        # (event loop, event) pairs of the open chatbot streams
+        self.__streams: Set[Tuple[asyncio.AbstractEventLoop, asyncio.Event]] = set()
+        self.__streams_lock: threading.Lock = threading.Lock()
+        # ids of the other agents that have sent to this user, for auto_target
+        self.__sender_ids: Set[str] = set()
+
+    def _receive(self, message: dict):
+        if message['from'] != self.id():
+            self.__sender_ids.add(message['from'])
+        super()._receive(message)
+        self.__message_log_updated()
+
+    def __message_log_updated(self):
+        """
+        Trims the message log to max_messages and wakes up chatbot streams
+        """
+        with self._message_log_lock:
+            excess = len(self._message_log) - self.__max_messages
+            if excess > 0:
+                del self._message_log[:excess]
+                # drop the rendered entries of the removed messages
+                rendered_excess = min(excess, self.__chatbot_messages_len)
+                del self.__chatbot_messages[:rendered_excess]
+                self.__chatbot_messages_len -= rendered_excess
+        with self.__streams_lock:
+            streams = list(self.__streams)
+        for stream in streams:
+            loop, changed = stream
+            try:
+                loop.call_soon_threadsafe(changed.set)
+            except RuntimeError:
+                # the stream's event loop has closed without closing the stream
+                with self.__streams_lock:
+                    self.__streams.discard(stream)
 
     @action
     def say(self, content):
         # We don't do anything to render an incoming message here because the
-        # get_chatbot_messages method will render the full message history
+        # stream_chatbot_messages method will render the full message history
         pass
 
     def send_message(self, text):
@@ -25,18 +143,48 @@ class GradioUser(Agent):
         """
         message = self.__parse_input_message(text)
         self.send(message)
+        self.__message_log_updated()
         return "", self.get_chatbot_messages()
 
     def get_chatbot_messages(self):
         """
         Returns the full message history for the Chatbot component
+
+        Only messages added since the last call are rendered.
+        """
+        user_id = self.id()
+        with self._message_log_lock:
+            for message in self._message_log[self.__chatbot_messages_len:]:
+                self.__chatbot_messages.append(
+                    self.__chatbot_message(message, user_id))
+            self.__chatbot_messages_len = len(self._message_log)
+            return list(self.__chatbot_messages)
+
+    async def stream_chatbot_messages(self) -> AsyncIterator[List[Tuple[str, str]]]:
         """
-        return [
-            self.__chatbot_message(message)
-            for message in self._message_log
-        ]
+        Yields the full message history for the Chatbot component each time
+        the message log changes
 
-    def __chatbot_message(self, message):
+        The stream waits on an asyncio.Event rather than a thread, so idle or
+        abandoned pages don't hold any of Gradio's worker threads. It is
+        unregistered as soon as the generator is closed or cancelled, e.g. when
+        the client disconnects.
+        """
+        changed = asyncio.Event()
+        stream = (asyncio.get_running_loop(), changed)
+        with self.__streams_lock:
+            self.__streams.add(stream)
+        try:
+            while True:
+                # cleared before rendering so that no change is missed
+                changed.clear()
+                yield self.get_chatbot_messages()
+                await changed.wait()
+        finally:
+            with self.__streams_lock:
+                self.__streams.discard(stream)
+
+    def __chatbot_message(self, message, user_id: str):
         """
         Returns a single message as a tuple for the Chatbot component
         """
@@ -44,9 +192,11 @@ class GradioUser(Agent):
         if message['action']['name'] == 'say':
             text += f"{message['action']['args']['content']}"
         else:
-            text += f"\n```javascript\n{json.dumps(message, indent=2)}\n```"
+            message_json = orjson.dumps(
+                message, option=orjson.OPT_INDENT_2).decode()
+            text += f"\n```javascript\n{message_json}\n```"
 
-        if message['from'] == self.id():
+        if message['from'] == user_id:
             return text, None
         else:
             return None, text
@@ -56,7 +206,9 @@ class GradioUser(Agent):
         Parses input text into a message.
 
         If the text does not begin with "/", it is assumed to be a broadcasted
-        "say" action, with the content argument set to the text.
+        "say" action, with the content argument set to the text. If
+        auto_target is enabled and exactly one other agent has been seen, the
+        "say" is sent to that agent instead.
 
         If the text begins with "/", it is assumed to be of the form:
 
@@ -75,7 +227,7 @@ class GradioUser(Agent):
         if not text.startswith("/"):
             # assume it's a broadcasted "say"
             return {
-                "to": "*",
+                "to": self.__say_target(),
                 "action": {
                     "name": "say",
                     "args": {
@@ -84,57 +236,32 @@ class GradioUser(Agent):
                 }
             }
 
-        pattern = r'^/(?:((?:"[^"]+")|(?:[^.\s]+))\.)?(\w+)\s*(.*)$'
-        match = re.match(pattern, text)
-
-        if not match:
-            raise ValueError("Invalid input format")
-
-        agent_id, action_name, args_str = match.groups()
-
-        if agent_id is None:
-            raise ValueError("Agent ID must be provided. Example: '/MyAgent.say' or '/*.say'")
-
-        args_pattern = r'(\w+):"([^"]*)"'
-        args = dict(re.findall(args_pattern, args_str))
+        agent_id, action_name, args = _parse_slash_command(text)
 
         return {
-            "to": agent_id.strip('"'),
+            "to": agent_id,
             "action": {
                 "name": action_name,
-                "args": args
+                "args": dict(args)
             }
         }
 
-    def demo(self):
-        # The following adapted from: https://www.gradio.app/docs/chatbot#demos
-
-        # Custom css to:
-        # - Expand text area to fill vertical space
-        # - Remove orange border from the chat area that appears because of polling
-        css = """
-        .gradio-container {
-            height: 100vh !important;
-        }
-
-        .gradio-container > .main,
-        .gradio-container > .main > .wrap,
-        .gradio-container > .main > .wrap > .contain,
-        .gradio-container > .main > .wrap > .contain > div {
-            height: 100% !important;
-        }
+    def __say_target(self) -> str:
+        """
+        Returns the recipient for a plain text "say"
+        """
+        if self.__auto_target and len(self.__sender_ids) == 1:
+            # copied so that a concurrent add can't change it while reading
+            return next(iter(set(self.__sender_ids)))
+        return "*"
 
-        #chatbot {
-            height: auto !important;
-            flex-grow: 1 !important;
-        }
+    def demo(self):
+        # gradio is slow to import so it's only loaded when the UI is built
+        import gradio as gr
 
-        #chatbot > div.wrap {
-            border: none !important;
-        }
-        """
+        # The following adapted from: https://www.gradio.app/docs/chatbot#demos
 
-        with gr.Blocks(css=css, title="Agency Demo") as demo:
+        with gr.Blocks(css=_GRADIO_CSS, title="Agency Demo") as demo:
             # Chatbot area
             chatbot = gr.Chatbot(
                 self.get_chatbot_messages,
@@ -155,11 +282,14 @@ class GradioUser(Agent):
             txt.submit(self.send_message, [txt], [txt, chatbot])
             btn.click(self.send_message, [txt], [txt, chatbot])
 
-            # Continously updates the chatbot. Runs only while client is connected.
+            # Pushes chatbot updates as messages arrive. Runs only while client
+            # is connected. Each open page holds its own stream.
             demo.load(
-                self.get_chatbot_messages, None, [chatbot], every=1
+                self.stream_chatbot_messages, None, [chatbot],
+                show_progress="hidden", concurrency_limit=None,
             )
 
-        # Queueing necessary for periodic events using `every`
-        demo.queue()
+        # Queueing necessary for streaming generator events. Sends from
+        # different pages may run concurrently, and the queue is bounded.
+        demo.queue(default_concurrency_limit=10, max_size=256, api_open=False)
         return demo
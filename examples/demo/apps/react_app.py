@@ -1,10 +1,12 @@
+import asyncio
+import collections
+import hashlib
 import logging
+import threading
 
-import eventlet
-from eventlet import wsgi
-from flask import Flask, render_template, request
-from flask.logging import default_handler
-from flask_socketio import SocketIO
+import uvicorn
+from quart import Quart, Response, render_template, request
+from socketio import ASGIApp, AsyncServer
 
 from agency.agent import ActionError, Agent, action
 from agency.schema import Message
@@ -13,10 +15,20 @@ from agency.space import Space
 # IMPORTANT! This example react application is out of date  and untested, but is
 # left here for reference. It will be updated or replaced in the future.
 
+# Outgoing messages are coalesced for this long before being emitted
+_EMIT_INTERVAL = 0.005
+# The maximum number of messages emitted in a single batch
+_EMIT_BATCH_SIZE = 64
+# The room joined by every connected user, used to emit broadcasts once
+_BROADCAST_ROOM = "*"
+# The number of recently emitted broadcast ids remembered to skip the other
+# users' copies of a broadcast, which may arrive in later batches
+_BROADCAST_IDS_REMEMBERED = 1024
+
 
 class ReactApp():
     """
-    A simple Flask/React web application which connects human users to a space.
+    A simple Quart/React web application which connects human users to a space.
     """
 
     def __init__(self, space: Space, port: int, demo_username: str):
@@ -24,69 +36,150 @@ class ReactApp():
         self.__port = port
         self.__demo_username = demo_username
         self.__current_user = None
+        self.__loop: asyncio.AbstractEventLoop = None
+        self.__outbox: asyncio.Queue = None
+        self.__broadcast_ids: collections.OrderedDict = None
+        self.__index_html: bytes = None
+        self.__index_etag: str = None
+        self.__app: Quart = None
+
+    def _emit(self, event: str, data, to: str = None):
+        """
+        Emits an event to the web client from any thread
+        """
+        asyncio.run_coroutine_threadsafe(
+            self.sio.emit(event, data, to=to), self.__loop)
 
-    def start(self):
+    def _enqueue(self, room: str, message: Message):
         """
-        Run Flask server in a separate thread
+        Queues a message to be emitted to the clients in the given room
+
+        Broadcast messages are emitted once to all users instead.
         """
-        app = Flask(__name__)
-        app.config['SECRET_KEY'] = 'secret!'
+        self.__loop.call_soon_threadsafe(
+            self.__outbox.put_nowait, (room, message))
 
-        # six lines to disable logging...
-        app.logger.removeHandler(default_handler)
-        app.logger.setLevel(logging.ERROR)
-        werkzeug_log = logging.getLogger('werkzeug')
-        werkzeug_log.setLevel(logging.ERROR)
-        eventlet_logger = logging.getLogger('eventlet.wsgi.server')
-        eventlet_logger.setLevel(logging.ERROR)
-
-        # start socketio server
-        self.socketio = SocketIO(app, async_mode='eventlet',
-                                 logger=False, engineio_logger=False)
-
-        # Define routes
-        @app.route('/')
-        def index():
-            return render_template(
+    async def __drain_outbox(self):
+        """
+        Emits queued messages in 'messages' batches
+
+        Consecutive messages for the same room are emitted together, so that
+        clients receive messages in the order they were queued.
+        """
+        while True:
+            queued = [await self.__outbox.get()]
+            for _ in range(_EMIT_BATCH_SIZE - 1):
+                try:
+                    queued.append(self.__outbox.get_nowait())
+                except asyncio.QueueEmpty:
+                    break
+            batch_room = None
+            batch = []
+            for room, message in queued:
+                if message['to'] == '*':
+                    # each user receives its own copy of a broadcast
+                    if message['meta']['id'] in self.__broadcast_ids:
+                        continue
+                    self.__broadcast_ids[message['meta']['id']] = None
+                    if len(self.__broadcast_ids) > _BROADCAST_IDS_REMEMBERED:
+                        self.__broadcast_ids.popitem(last=False)
+                    room = _BROADCAST_ROOM
+                if batch and room != batch_room:
+                    await self.sio.emit('messages', batch, room=batch_room)
+                    batch = []
+                batch_room = room
+                batch.append(message)
+            if batch:
+                await self.sio.emit('messages', batch, room=batch_room)
+            await asyncio.sleep(_EMIT_INTERVAL)
+
+    async def __on_startup(self):
+        async with self.__app.app_context():
+            index_html = await render_template(
                 'index.html',
                 username=f"{self.__demo_username}")
+        self.__index_html = index_html.encode()
+        self.__index_etag = hashlib.md5(self.__index_html).hexdigest()
+        self.__loop = asyncio.get_running_loop()
+        self.__outbox = asyncio.Queue()
+        self.__broadcast_ids = collections.OrderedDict()
+        self.sio.start_background_task(self.__drain_outbox)
+
+    async def __index(self):
+        # the page is rendered once at startup
+        headers = {'ETag': self.__index_etag, 'Cache-Control': 'no-cache'}
+        if request.headers.get('If-None-Match') == self.__index_etag:
+            return Response(status=304, headers=headers)
+        return Response(self.__index_html, mimetype='text/html',
+                        headers=headers)
+
+    async def __handle_connect(self, sid, environ):
+        # When a client connects add them to the space
+        # NOTE We're hardcoding a single demo_username for simplicity
+        self.__current_user = ReactAppUser(
+            name=self.__demo_username,
+            app=self,
+            sid=sid
+        )
+        await self.sio.enter_room(sid, self.__current_user.id())
+        await self.sio.enter_room(sid, _BROADCAST_ROOM)
+        await asyncio.to_thread(self.__space.add, self.__current_user)
+
+    async def __handle_disconnect(self, sid):
+        # When a client disconnects remove them from the space
+        await asyncio.to_thread(self.__space.remove, self.__current_user)
+        self.__current_user = None
 
-        @self.socketio.on('connect')
-        def handle_connect():
-            # When a client connects add them to the space
-            # NOTE We're hardcoding a single demo_username for simplicity
-            self.__current_user = ReactAppUser(
-                name=self.__demo_username,
-                app=self,
-                sid=request.sid
-            )
-            self.__space.add(self.__current_user)
-
-        @self.socketio.on('disconnect')
-        def handle_disconnect():
-            # When a client disconnects remove them from the space
-            self.__space.remove(self.__current_user)
-            self.__current_user = None
-
-        @self.socketio.on('message')
-        def handle_action(action):
-            """
-            Handles sending incoming actions from the web interface
-            """
-            self.__current_user.send(action)
-
-        @self.socketio.on('permission_response')
-        def handle_alert_response(allowed: bool):
-            """
-            Handles incoming alert response from the web interface
-            """
-            raise NotImplementedError()
-
-        # Wrap the Flask application with wsgi middleware and start
-        def run_server():
-            wsgi.server(eventlet.listen(('', int(self.__port))),
-                        app, log=eventlet_logger)
-        eventlet.spawn(run_server)
+    async def __handle_action(self, sid, action):
+        """
+        Handles sending incoming actions from the web interface
+        """
+        await asyncio.to_thread(self.__current_user.send, action)
+
+    async def __handle_alert_response(self, sid, allowed: bool):
+        """
+        Handles incoming alert response from the web interface
+        """
+        raise NotImplementedError()
+
+    def start(self):
+        """
+        Run the ASGI server in a separate thread
+        """
+        app = Quart(__name__)
+        app.config['SECRET_KEY'] = 'secret!'
+        app.logger.setLevel(logging.ERROR)
+        self.__app = app
+
+        # start socketio server, encoding packets with msgpack. Only payloads
+        # over 1KiB are compressed since small messages gain nothing from it.
+        self.sio = AsyncServer(async_mode='asgi', serializer='msgpack',
+                               http_compression=True,
+                               compression_threshold=1024,
+                               logger=False, engineio_logger=False)
+
+        # Define routes and event handlers
+        app.add_url_rule('/', 'index', self.__index)
+        self.sio.on('connect', self.__handle_connect)
+        self.sio.on('disconnect', self.__handle_disconnect)
+        self.sio.on('message', self.__handle_action)
+        self.sio.on('permission_response', self.__handle_alert_response)
+
+        # Serve socketio alongside the Quart application on uvloop
+        asgi_app = ASGIApp(self.sio, other_asgi_app=app,
+                           on_startup=self.__on_startup)
+        server = uvicorn.Server(uvicorn.Config(
+            asgi_app,
+            host='0.0.0.0',
+            port=int(self.__port),
+            log_level='error',
+            loop='uvloop',
+            http='httptools',
+            ws='websockets',
+            # websocket frames can't be compressed selectively, so they aren't
+            ws_per_message_deflate=False,
+        ))
+        threading.Thread(target=server.run, daemon=True).start()
 
 
 class ReactAppUser(Agent):
@@ -94,6 +187,8 @@ class ReactAppUser(Agent):
     A human user of the web app
     """
 
+    __slots__ = ("name", "app", "sid")
+
     def __init__(self, name: str, app: ReactApp, sid: str) -> None:
         super().__init__(id=name)
         self.name = name
@@ -105,8 +200,7 @@ class ReactAppUser(Agent):
         Raises an alert in the users browser and returns true if the user
         approves the action
         """
-        self.app.socketio.server.emit(
-            'permission_request', proposed_message)
+        self.app._emit('permission_request', proposed_message)
 
     # The following methods simply forward incoming messages to the web client
 
@@ -115,13 +209,10 @@ class ReactAppUser(Agent):
         """
         Sends a message to the user
         """
-        self.app.socketio.server.emit(
-            'message', self.current_message(), room=self.sid)
+        self.app._enqueue(self.id(), self.current_message())
 
     def handle_action_value(self, value):
-        self.app.socketio.server.emit(
-            'message', self.current_message(), room=self.sid)
+        self.app._enqueue(self.id(), self.current_message())
 
     def handle_action_error(self, error: ActionError):
-        self.app.socketio.server.emit(
-            'message', self.current_message(), room=self.sid)
+        self.app._enqueue(self.id(), self.current_message())
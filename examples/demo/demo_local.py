@@ -1,13 +1,19 @@
 import os
-import time
+import signal
+import threading
 
 from agency.spaces.local_space import LocalSpace
 from examples.demo.agents.host import Host
 from examples.demo.agents.openai_function_agent import OpenAIFunctionAgent
 from examples.demo.apps.gradio_app import GradioUser
 
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+
 if __name__ == "__main__":
 
+    if not OPENAI_API_KEY:
+        raise ValueError("OPENAI_API_KEY must be set")
+
     # Create the space instance
     with LocalSpace() as space:
 
@@ -18,7 +24,7 @@ if __name__ == "__main__":
         space.add(OpenAIFunctionAgent,
                   "FunctionAI",
                   model="gpt-3.5-turbo-16k",
-                  openai_api_key=os.getenv("OPENAI_API_KEY"),
+                  openai_api_key=OPENAI_API_KEY,
                   # user_id determines the "user" role in the OpenAI chat API
                   user_id="User")
 
@@ -33,9 +39,8 @@ if __name__ == "__main__":
             quiet=True,
         )
 
-        try:
-            # block here until Ctrl-C
-            while True:
-                time.sleep(1)
-        except KeyboardInterrupt:
-            pass
+        # block here until Ctrl-C or SIGTERM
+        stop = threading.Event()
+        signal.signal(signal.SIGINT, lambda *_: stop.set())
+        signal.signal(signal.SIGTERM, lambda *_: stop.set())
+        stop.wait()
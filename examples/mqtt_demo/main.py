@@ -7,7 +7,13 @@ sys.path.append("../demo")
 from apps.gradio_app import GradioApp
 from agents.openai_function_agent import OpenAIFunctionAgent
 
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+WEB_APP_PORT = int(os.getenv("WEB_APP_PORT", "8080"))
+
 if __name__ == "__main__":
+    if not OPENAI_API_KEY:
+        raise ValueError("OPENAI_API_KEY must be set")
+
     space = AMQPSpace()
 
     demo = GradioApp(space).demo()
@@ -16,8 +22,8 @@ if __name__ == "__main__":
     space.add(OpenAIFunctionAgent,
                 "FunctionAI",
                 model="gpt-3.5-turbo-16k",
-                openai_api_key=os.getenv("OPENAI_API_KEY"),
+                openai_api_key=OPENAI_API_KEY,
                 # user_id determines the "user" role in the OpenAI chat API
                 user_id="User")
 
-    demo.launch(server_port=int(os.getenv("WEB_APP_PORT")))
+    demo.launch(server_port=WEB_APP_PORT)
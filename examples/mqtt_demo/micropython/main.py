@@ -18,26 +18,28 @@ mqtt_password = "guest"
 
 
 class SmartHomeAgent(UAgent):
+    _HELP = {
+        "set": {
+            "description": "can set device state of Smart Home. device: [fan, light], state: [on, off]",
+            "args": {
+                "device": {"type": "string"},
+                "state": {"type": "string"},
+            },
+        }
+    }
+    _STATES = {"on": 1, "off": 0}
+
     def __init__(self, id: str) -> None:
         self.fan = Pin(16, Pin.OUT)
         self.light = Pin(22, Pin.OUT)
+        self._devices = {"fan": self.fan, "light": self.light}
         super().__init__(id)
 
     def _help(self, action_name: str = None) -> list:
-        help = {
-            "set": {
-                "description": "can set device state of Smart Home. device: [fan, light], state: [on, off]",
-                "args": {
-                    "device": {"type": "string"},
-                    "state": {"type": "string"},
-                },
-            }
-        }
-
         if action_name:
-            return help.get(action_name)
+            return self._HELP.get(action_name)
         else:
-            return help
+            return self._HELP
 
     def after_add(self):
         self.send({
@@ -56,11 +58,9 @@ class SmartHomeAgent(UAgent):
     @action
     def set(self, device: str, state: str):
         print(device, state)
-        map_ = {"on": 1, "off": 0}
-        if device == "fan":
-            self.fan.value(map_[state])
-        if device == "light":
-            self.light.value(map_[state])
+        pin = self._devices.get(device)
+        if pin is not None:
+            pin.value(self._STATES[state])
         return "ok"
 
     @action
@@ -68,23 +68,23 @@ class SmartHomeAgent(UAgent):
         pass
 
 class RobotAgent(UAgent):
+    _HELP = {
+        "set": {
+            "description": "Sends a message to this agent",
+            "args": {
+                "content": {"type": "string"},
+            },
+        }
+    }
+
     def __init__(self, id: str) -> None:
         super().__init__(id)
 
     def _help(self, action_name: str = None) -> list:
-        help = {
-            "set": {
-                "description": "Sends a message to this agent",
-                "args": {
-                    "content": {"type": "string"},
-                },
-            }
-        }
-
         if action_name:
-            return help.get(action_name)
+            return self._HELP.get(action_name)
         else:
-            return help
+            return self._HELP
 
     def after_add(self):
         self.send({
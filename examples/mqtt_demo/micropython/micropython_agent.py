@@ -1,11 +1,15 @@
 # import inspect  # install micropython_inspect
-import re
+from collections import deque
+
+import micropython
+from micropython import const
 
 # access keys
 ACCESS = "access"
-ACCESS_PERMITTED = "permitted"
-ACCESS_DENIED = "denied"
-ACCESS_REQUESTED = "requested"
+# access policies are small ints so that they compare cheaply
+ACCESS_PERMITTED = const(0)
+ACCESS_DENIED = const(1)
+ACCESS_REQUESTED = const(2)
 
 # Special action name for responses
 _RESPONSE_ACTION_NAME = "[response]"
@@ -39,39 +43,51 @@ class UAgent:
     An Actor that may represent an AI agent, computing system, or human user
     """
 
-    def __init__(self, id: str, receive_own_broadcasts: bool = True) -> None:
+    def __init__(self,
+                 id: str,
+                 receive_own_broadcasts: bool = True,
+                 max_messages: int = 128) -> None:
         if len(id) < 1 or len(id) > 255:
             raise ValueError("id must be between 1 and 255 characters")
-        if re.match(r"^amq\.", id):
+        if id.startswith("amq."):
             raise ValueError('id cannot start with "amq."')
         if id == "*":
             raise ValueError('id cannot be "*"')
-        self.__id: str = id
+        self._id: str = id
         self.__receive_own_broadcasts = receive_own_broadcasts
         self._space = None  # set by Space when added
-        self._message_log = []  # stores all messages
+        # stores the most recent messages, bounded to save memory
+        self._message_log = deque((), max_messages)
+        # maps each action name to its bound method and access policy
+        self.__dispatch = {}
+        for name, policy in _function_access_policies.items():
+            method = getattr(self, name, None)
+            if method is not None:
+                self.__dispatch[name] = (method, policy["access_policy"])
 
     def id(self) -> str:
         """
         Returns the id of this agent
         """
-        return self.__id
+        return self._id
 
+    @micropython.native
     def send(self, message: dict):
         """
         Sends (out) an message
         """
-        message["from"] = self.id()
+        message["from"] = self._id
         self._message_log.append(message)
         self._space._route(message=message)
 
+    @micropython.native
     def _receive(self, message: dict):
         """
         Receives and processes an incoming message
         """
         if (
             not self.__receive_own_broadcasts
-            and message["from"] == self.id()
+            and message["from"] == self._id
             and message["to"] == "*"
         ):
             return
@@ -79,16 +95,15 @@ class UAgent:
         # Record message and commit action
         self._message_log.append(message)
 
-        if message["action"]["name"] == _RESPONSE_ACTION_NAME:
-            if "value" in message["action"]["args"]:
-                handler_callback = self.handle_action_value
-                arg = message["action"]["args"]["value"]
-            elif "error" in message["action"]["args"]:
-                handler_callback = self.handle_action_error
-                arg = ActionError(message["action"]["args"]["error"])
+        action = message["action"]
+        if action["name"] == _RESPONSE_ACTION_NAME:
+            args = action["args"]
+            if "value" in args:
+                self.handle_action_value(args["value"])
+            elif "error" in args:
+                self.handle_action_error(ActionError(args["error"]))
             else:
                 raise RuntimeError("Unknown action response")
-            handler_callback(arg)
         else:
             try:
                 self.__commit(message)
@@ -103,7 +118,7 @@ class UAgent:
                         "response_id": response_id
                     },
                     "to": message['from'],
-                    "from": self.id(),
+                    "from": self._id,
                     "action": {
                         "name": _RESPONSE_ACTION_NAME,
                         "args": {
@@ -113,28 +128,26 @@ class UAgent:
                     }
                 })
 
+    @micropython.native
     def __commit(self, message: dict):
         """
         Invokes action if permitted otherwise raises PermissionError
         """
-        # Check if the action method exists
-        action_method = None
-        try:
-            # action_method = self.__action_method(message["action"]["name"])
-            action_method = getattr(self, f"{message['action']['name']}")
-            assert (
-                message["action"]["name"] in _function_access_policies
-            )  # security check
-        except KeyError:
+        # Look up the action method and its access policy
+        action = message["action"]
+        action_name = action["name"]
+        entry = self.__dispatch.get(action_name)
+        if entry is None:
             # the action was not found
-            if message["to"] == self.id():
+            if message["to"] == self._id:
                 # if it was point to point, raise an error
                 raise AttributeError(
-                    f"\"{message['action']['name']}\" not found on \"{self.id()}\""
+                    f"\"{action_name}\" not found on \"{self._id}\""
                 )
             else:
                 # broadcasts will not raise an error
                 return
+        action_method, policy = entry
 
         self.before_action(message)
 
@@ -142,11 +155,22 @@ class UAgent:
         error = None
         try:
             # Check if the action is permitted
-            if self.__permitted(message):
+            if policy == ACCESS_PERMITTED:
+                permitted = True
+            elif policy == ACCESS_DENIED:
+                permitted = False
+            elif policy == ACCESS_REQUESTED:
+                permitted = self.request_permission(message)
+            else:
+                raise Exception(
+                    f"Invalid access policy for method: {action}, got '{policy}'"
+                )
+
+            if permitted:
                 # Invoke the action method
                 # (set _current_message so that it can be used by the action)
                 self._current_message = message
-                return_value = action_method(**message["action"]["args"])
+                return_value = action_method(**action["args"])
                 self._current_message = None
 
                 # The return value if any, from an action method is sent back to
@@ -168,32 +192,15 @@ class UAgent:
                     })
             else:
                 raise PermissionError(
-                    f"\"{self.id()}.{message['action']['name']}\" not permitted"
+                    f"\"{self._id}.{action_name}\" not permitted"
                 )
         except Exception as e:
             error = e  # save the error for after_action
-            raise
+            # the native emitter requires raise to be given an argument
+            raise e
         finally:
             self.after_action(message, return_value, error)
 
-    def __permitted(self, message: dict) -> bool:
-        """
-        Checks whether the action represented by the message is allowed
-        """
-        policy = _function_access_policies[f"{message['action']['name']}"][
-            "access_policy"
-        ]
-        if policy == ACCESS_PERMITTED:
-            return True
-        elif policy == ACCESS_DENIED:
-            return False
-        elif policy == ACCESS_REQUESTED:
-            return self.request_permission(message)
-        else:
-            raise Exception(
-                f"Invalid access policy for method: {message['action']}, got '{policy}'"
-            )
-
     @action
     def help(self, action_name: str = None) -> list:
         """
@@ -1,4 +1,5 @@
 import json
+import select
 from umqtt.simple import MQTTClient # https://github.com/micropython/micropython-lib/tree/master/micropython/umqtt.simple, install from Thonny
 
 class UMQTTSpace:
@@ -10,13 +11,25 @@ class UMQTTSpace:
 
     def __init__(self, *args, **kwargs):
         self.agents = []
+        self._agents_by_id = {}
+        # messages sent while delivering are delivered and published together
+        # afterwards
+        self._inbox = []
+        self._pending = []
+        self._delivering = False
 
         def _on_message(topic, msg):
-            body = msg
-            message_data = json.loads(json.loads(body))
-            for agent in self.agents:
-                if message_data['to'] == '*' or message_data['to'] == agent.id():
-                    agent._receive(message_data)
+            message_data = json.loads(msg)
+            to = message_data['to']
+            if to == '*':
+                if message_data['from'] in self._agents_by_id:
+                    # local broadcasts were already delivered by _route
+                    return
+                self.__deliver(self.agents, message_data)
+            else:
+                agent = self._agents_by_id.get(to)
+                if agent is not None:
+                    self.__deliver((agent,), message_data)
 
         self.mqtt_client = MQTTClient(*args, **kwargs)
         self.mqtt_client.set_callback(_on_message)
@@ -25,6 +38,7 @@ class UMQTTSpace:
 
     def add(self, agent) -> None:
         self.agents.append(agent)
+        self._agents_by_id[agent.id()] = agent
         agent._space = self
         agent.after_add()
 
@@ -32,6 +46,7 @@ class UMQTTSpace:
         agent.before_remove()
         agent._space = None
         self.agents.remove(agent)
+        del self._agents_by_id[agent.id()]
 
     def _route(self, message) -> None:
         # todo message integrity check
@@ -40,27 +55,68 @@ class UMQTTSpace:
         assert "action" in message
         # ...
 
-        if message['to'] == '*':
-            # broadcast
-            routing_key = self.BROADCAST_KEY
+        to = message['to']
+        if to == '*':
+            # broadcast, published for peers and delivered locally
+            self.__publish(self.BROADCAST_KEY, message)
+            self.__deliver(self.agents, message)
+            return
+
+        agent = self._agents_by_id.get(to)
+        if agent is not None:
+            # point to point to an agent on this device, skip the broker
+            self.__deliver((agent,), message)
         else:
             # point to point
-            routing_key = message['to']
+            self.__publish(to, message)
 
-        self.__publish(routing_key, message)
-        
+    def __deliver(self, agents, message: dict):
+        self._inbox.append((agents, message))
+        if not self._delivering:
+            self._flush()
 
     def __publish(self, routing_key: str, message: dict):
-        self.mqtt_client.publish(routing_key, json.dumps(message))
+        self._pending.append((routing_key, json.dumps(message)))
+        if not self._delivering:
+            self._flush()
+
+    def _flush(self):
+        """
+        Delivers local messages, then publishes pending messages back to back
+        """
+        if self._delivering:
+            return
+        self._delivering = True
+        try:
+            while self._inbox:
+                inbox = self._inbox
+                self._inbox = []
+                for agents, message in inbox:
+                    for agent in agents:
+                        agent._receive(message)
+        finally:
+            self._delivering = False
+
+        pending = self._pending
+        self._pending = []
+        for routing_key, payload in pending:
+            self.mqtt_client.publish(routing_key, payload)
 
     def start(self):
         for agent in self.agents:
             self.mqtt_client.subscribe(agent.id())
         self.mqtt_client.subscribe(self.BROADCAST_KEY)
 
+        # poll the socket instead of blocking in wait_msg() so that the loop
+        # can flush outbound messages between reads
+        poller = select.poll()
+        poller.register(self.mqtt_client.sock, select.POLLIN)
+
         print("wait for message...")
         try:
             while True:
-                self.mqtt_client.wait_msg()
+                if poller.poll(10):
+                    self.mqtt_client.check_msg()
+                self._flush()
         finally:
             self.mqtt_client.disconnect()
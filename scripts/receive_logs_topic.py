@@ -13,11 +13,26 @@ Usage:
 
 import sys
 import os
-import time
+import queue
 import socket
+import threading
 import kombu
 
 
+def print_logs(logs: queue.Queue):
+    """Prints received logs, writing whatever has queued up at once"""
+    while True:
+        lines = [logs.get()]
+        try:
+            while True:
+                lines.append(logs.get_nowait())
+        except queue.Empty:
+            pass
+        sys.stdout.write(
+            "".join(" [x] %r:%r\n" % (routing_key, body) for routing_key, body in lines))
+        sys.stdout.flush()
+
+
 def main():
     connection = kombu.Connection(
         hostname="localhost",
@@ -39,22 +54,27 @@ def main():
             for binding_key in binding_keys
         ]
 
-        for queue in queues:
-            queue(conn.channel()).declare()
+        for q in queues:
+            q(conn.channel()).declare()
+
+        # printing happens on another thread so that it doesn't hold up acks
+        logs = queue.Queue(maxsize=10000)
+        threading.Thread(target=print_logs, args=(logs,), daemon=True).start()
 
         def callback(body, message):
             message.ack()
-            print(" [x] %r:%r" % (message.delivery_info["routing_key"], body))
+            logs.put((message.delivery_info["routing_key"], body))
 
-        with conn.Consumer(queues, callbacks=[callback]):
+        # let the broker stream messages in batches
+        with conn.Consumer(queues, callbacks=[callback], prefetch_count=100):
             print(" [*] Waiting for logs. To exit press CTRL+C")
             while True:
-                time.sleep(0.01)
-                conn.heartbeat_check()  # sends heartbeat if necessary
+                # block until a frame arrives rather than polling
                 try:
-                    conn.drain_events(timeout=0.01)
+                    conn.drain_events(timeout=1.0)
                 except socket.timeout:
                     pass
+                conn.heartbeat_check()  # sends heartbeat if necessary
 
 
 if __name__ == "__main__":
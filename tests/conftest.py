@@ -1,4 +1,5 @@
 import os
+import socket
 import subprocess
 import time
 import tracemalloc
@@ -14,59 +15,73 @@ tracemalloc.start()
 
 RABBITMQ_OUT = subprocess.DEVNULL  # DEVNULL for no output, PIPE for output
 SKIP_AMQP = os.environ.get("SKIP_AMQP")
+TEARDOWN_RABBITMQ = os.environ.get("TEARDOWN_RABBITMQ")
 
 
 @pytest.fixture(scope="session", autouse=True)
 def rabbitmq_container():
     """
-    Starts and stops a RabbitMQ container for the duration of the test
+    Starts a RabbitMQ container for the test session, or reuses one that is
+    already running.
+
+    The container is left running afterwards so that later sessions can reuse
+    it. Set TEARDOWN_RABBITMQ=1 to stop and remove it at the end of the
     session.
     """
     if SKIP_AMQP:
         yield None
         return
 
-    container = subprocess.Popen(
-        [
-            "docker", "run",
-            "--name", "rabbitmq-test",
-            "-p", "5672:5672",
-            "-p", "15672:15672",
-            "--user", "rabbitmq:rabbitmq",
-            "rabbitmq:3-management",
-        ],
-        start_new_session=True,
-        stdout=RABBITMQ_OUT,
-        stderr=RABBITMQ_OUT
-    )
+    running = subprocess.run(
+        ["docker", "inspect", "-f", "{{.State.Running}}", "rabbitmq-test"],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        text=True,
+    ).stdout.strip()
+
+    if running != "true":
+        # remove a stopped container so that the name can be reused
+        subprocess.run(["docker", "rm", "rabbitmq-test"],
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        subprocess.run(
+            [
+                "docker", "run", "-d",
+                "--name", "rabbitmq-test",
+                "-p", "5672:5672",
+                "-p", "15672:15672",
+                "--user", "rabbitmq:rabbitmq",
+                "rabbitmq:3-management",
+            ],
+            check=True,
+            stdout=RABBITMQ_OUT,
+            stderr=RABBITMQ_OUT
+        )
     try:
         wait_for_rabbitmq()
-        yield container
+        yield "rabbitmq-test"
     finally:
-        subprocess.run(["docker", "stop", "rabbitmq-test"])
-        subprocess.run(["docker", "rm", "rabbitmq-test"])
-        container.wait()
+        if TEARDOWN_RABBITMQ:
+            subprocess.run(["docker", "stop", "rabbitmq-test"])
+            subprocess.run(["docker", "rm", "rabbitmq-test"])
 
 
 def wait_for_rabbitmq():
+    """
+    Waits until RabbitMQ answers the AMQP protocol header on port 5672
+    """
     print("Waiting for RabbitMQ server to start...")
-    retries = 20
-    for _ in range(retries):
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
         try:
-            result = subprocess.run([
-                "docker", "exec", "rabbitmq-test",
-                "rabbitmq-diagnostics", "check_running"
-            ],
-                stdout=RABBITMQ_OUT,
-                stderr=RABBITMQ_OUT,
-                check=True,
-            )
-            if result.returncode == 0:
-                print("RabbitMQ server is up and running.")
-                return
-        except subprocess.CalledProcessError:
+            with socket.create_connection(("localhost", 5672), timeout=1) as sock:
+                sock.sendall(b"AMQP\x00\x00\x09\x01")
+                # the server only replies once it is accepting connections
+                if sock.recv(8):
+                    print("RabbitMQ server is up and running.")
+                    return
+        except OSError:
             pass
-        time.sleep(0.5)
+        time.sleep(0.1)
     raise Exception("RabbitMQ server failed to start.")
 
 
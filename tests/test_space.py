@@ -1,11 +1,15 @@
+import json
 import os
 import time
 
+import kombu
 import pytest
 
 from agency.agent import Agent, action
 from agency.space import Space
-from agency.spaces.amqp_space import AMQPOptions, AMQPSpace
+from agency.spaces import amqp_space as amqp_space_module
+from agency.spaces.amqp_space import (AMQPOptions, AMQPSpace,
+                                      _AMQPOutboundQueue)
 from agency.spaces.local_space import LocalSpace
 from tests.conftest import SKIP_AMQP
 from tests.helpers import assert_message_log
@@ -84,6 +88,76 @@ def test_amqp_heartbeat():
         amqp_space_with_short_heartbeat.destroy()
 
 
+@pytest.mark.skipif(SKIP_AMQP, reason=f"SKIP_AMQP={SKIP_AMQP}")
+def test_amqp_publish_after_idling_past_heartbeat():
+    """
+    Asserts that a message sent after the publishing connection has been idle
+    for longer than the heartbeat interval is still delivered
+    """
+    amqp_space_with_short_heartbeat = AMQPSpace(
+        amqp_options=AMQPOptions(heartbeat=2), exchange_name="agency-test")
+
+    try:
+        hartford = amqp_space_with_short_heartbeat.add_foreground(
+            _Harford, "Hartford")
+        first_message = {
+            "meta": {"id": "1"},
+            "from": "Hartford",
+            "to": "Hartford",
+            "action": {"name": "say", "args": {"content": "Hello"}},
+        }
+        hartford.send(first_message)
+        assert_message_log(hartford._message_log, [
+            first_message,  # send
+            first_message,  # receive
+        ])
+
+        # leave the pooled publishing connection idle past the heartbeat
+        time.sleep(6)  # 3 x heartbeat
+
+        second_message = {**first_message, "meta": {"id": "2"}}
+        hartford.send(second_message)
+        assert_message_log(hartford._message_log, [
+            first_message,
+            first_message,
+            second_message,
+            second_message,
+        ])
+
+    finally:
+        amqp_space_with_short_heartbeat.destroy()
+
+
+@pytest.mark.skipif(SKIP_AMQP, reason=f"SKIP_AMQP={SKIP_AMQP}")
+def test_amqp_receives_raw_json(amqp_space: AMQPSpace):
+    """
+    Asserts that messages published as raw JSON by other clients, e.g. over
+    MQTT, are decoded and received
+    """
+    receiver = amqp_space.add_foreground(_Harford, "Receiver")
+    message = {
+        "meta": {"id": "123"},
+        "from": "MQTTClient",
+        "to": "Receiver",
+        "action": {
+            "name": "say",
+            "args": {
+                "content": "Hello",
+            }
+        },
+    }
+    # published as undecoded bytes, as the RabbitMQ MQTT plugin does
+    with kombu.Connection(hostname="localhost", port=5672) as connection:
+        connection.Producer().publish(
+            json.dumps(message).encode(),
+            content_type="application/data",
+            content_encoding="binary",
+            exchange=kombu.Exchange("agency-test", "topic", durable=True),
+            routing_key="Receiver",
+        )
+    assert_message_log(receiver._message_log, [message])
+
+
 def test_local_space_unique_ids(local_space):
     """
     Asserts that two agents may not have the same id in a LocalSpace
@@ -131,3 +205,43 @@ def test_after_add_and_before_remove(any_space: Space):
     any_space.remove("Sender")
 
     assert list(sender._message_log) == ["added", "removed"]
+
+
+def test_amqp_publish_fails_when_broker_unreachable():
+    """
+    Asserts that sending raises rather than blocking when the broker cannot be
+    reached
+    """
+    outbound_queue = _AMQPOutboundQueue(
+        AMQPOptions(port=1), exchange_name="agency-test", routing_key="Sender")
+    outbound_queue.connect()
+    try:
+        with pytest.raises(kombu.exceptions.OperationalError):
+            outbound_queue.put({
+                "from": "Sender",
+                "to": "Receiver",
+                "action": {"name": "say", "args": {"content": "Hello"}},
+            })
+    finally:
+        outbound_queue.disconnect()
+
+
+def test_amqp_producer_pools_released_on_disconnect():
+    """
+    Asserts that the shared publishing pools are closed once the last outbound
+    queue using them disconnects
+    """
+    queues = [
+        _AMQPOutboundQueue(
+            AMQPOptions(port=1), exchange_name="agency-test", routing_key=agent_id)
+        for agent_id in ["Sender1", "Sender2"]
+    ]
+    for outbound_queue in queues:
+        outbound_queue.connect()
+    key = queues[0]._producer_pool_key
+
+    queues[0].disconnect()
+    assert key in amqp_space_module._producer_pools
+
+    queues[1].disconnect()
+    assert key not in amqp_space_module._producer_pools